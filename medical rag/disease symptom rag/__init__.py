@@ -3,29 +3,41 @@ Medical Knowledge Graph RAG System Package
 
 A Python package for medical question answering using Neo4j knowledge graphs
 and Azure OpenAI integration.
+
+Exports are loaded lazily (PEP 562) so importing the package does not pull in
+LangChain, the Neo4j driver or the OpenAI SDK until a name is first used.
 """
 
-from .main import MedicalRAGSystem
-from .utils import (
-    MedicalQueryHelper,
-    OptimizedMedicalChain,
-    create_medical_query_helper,
-    create_optimized_chain,
-    ADVANCED_CYPHER_TEMPLATE,
-    QA_TEMPLATE
-)
-from .demo import MedicalRAGDemo
+import importlib
 
 __version__ = "1.0.0"
 __author__ = "Medical RAG Team"
 
-__all__ = [
-    "MedicalRAGSystem",
-    "MedicalQueryHelper", 
-    "OptimizedMedicalChain",
-    "MedicalRAGDemo",
-    "create_medical_query_helper",
-    "create_optimized_chain",
-    "ADVANCED_CYPHER_TEMPLATE",
-    "QA_TEMPLATE"
-]
\ No newline at end of file
+# Public name -> submodule that defines it
+_LAZY_EXPORTS = {
+    "MedicalRAGSystem": ".main",
+    "MedicalQueryHelper": ".utils",
+    "OptimizedMedicalChain": ".utils",
+    "MedicalRAGDemo": ".demo",
+    "create_medical_query_helper": ".utils",
+    "create_optimized_chain": ".utils",
+    "ADVANCED_CYPHER_TEMPLATE": ".utils",
+    "QA_TEMPLATE": ".utils",
+    "ADVANCED_CYPHER_PROMPT": ".utils",
+    "QA_PROMPT": ".utils"
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __package__)
+        value = getattr(module, name)
+        globals()[name] = value  # cache so later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -3,19 +3,55 @@ Medical Knowledge Graph RAG System
 Main module for setting up connections and RAG chains
 """
 
-print("🚀 Starting Medical RAG System...")
-
+import asyncio
+import logging
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain.chat_models import AzureChatOpenAI
 from dotenv import load_dotenv
 from langchain_neo4j import Neo4jGraph
 from langchain_core.prompts import PromptTemplate
 
-print("✓ Imports successful...")
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
 
 # Load environment variables
 load_dotenv()
 
+# Idempotent index for the exact d.name = $condition lookups. The CONTAINS
+# and IN fallbacks compare toLower(name), which no index can serve. Disease
+# names are not unique in the source data, so this is a plain range index
+# rather than a uniqueness constraint.
+NAME_INDEX_STATEMENTS = [
+    "CREATE INDEX disease_name IF NOT EXISTS FOR (d:Disease) ON (d.name)",
+]
+
+# Neo4jGraph instances shared across MedicalRAGSystem instances, keyed by
+# (uri, username, database), so they reuse one driver and connection pool
+_GRAPH_CACHE = {}
+
+
+def get_shared_graph(url, username, password, database=None):
+    """Return the shared Neo4jGraph for this connection, creating it on first use"""
+    key = (url, username, database)
+    graph = _GRAPH_CACHE.get(key)
+    if graph is None:
+        graph = Neo4jGraph(
+            url=url,
+            username=username,
+            password=password,
+            database=database,
+            driver_config={
+                "max_connection_pool_size": int(os.getenv("NEO4J_POOL_SIZE", "32")),
+                "connection_acquisition_timeout": float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+            }
+        )
+        _GRAPH_CACHE[key] = graph
+    return graph
+
 class MedicalRAGSystem:
     """Main class for the Medical RAG System"""
     
@@ -24,20 +60,22 @@ class MedicalRAGSystem:
         self.llm = None
         self.graph_qa_chain = None
         self.optimized_chain = None
-        self.optimized_chain_verbose = None
+        self._schema_cache = None
+        self.disease_index = None
         
     def setup_connections(self):
         """Set up Neo4j and Azure OpenAI connections"""
-        print("Setting up connections...")
+        logger.info("Setting up connections...")
         
-        # Display environment variables for verification
-        print("NEO4J_2_URI:", os.getenv("NEO4J_2_URI"))
-        print("NEO4J_2_USERNAME:", os.getenv("NEO4J_2_USERNAME"))
-        print("NEO4J_2_PASSWORD:", os.getenv("NEO4J_2_PASSWORD"))
-        print("NEO4J_2_DATABASE:", os.getenv("NEO4J_2_DATABASE"))
+        # Display environment variables for verification (password masked)
+        logger.debug("NEO4J_2_URI: %s", os.getenv("NEO4J_2_URI"))
+        logger.debug("NEO4J_2_USERNAME: %s", os.getenv("NEO4J_2_USERNAME"))
+        logger.debug("NEO4J_2_PASSWORD: %s", "***" if os.getenv("NEO4J_2_PASSWORD") else None)
+        logger.debug("NEO4J_2_DATABASE: %s", os.getenv("NEO4J_2_DATABASE"))
         
-        # Connect to Neo4j Environment 2 with proper database specification
-        self.graph = Neo4jGraph(
+        # Connect to Neo4j Environment 2 with proper database specification,
+        # reusing the driver if this connection has already been opened
+        self.graph = get_shared_graph(
             url=os.getenv("NEO4J_2_URI"),
             username=os.getenv("NEO4J_2_USERNAME"),
             password=os.getenv("NEO4J_2_PASSWORD"),
@@ -46,7 +84,13 @@ class MedicalRAGSystem:
         
         # Test the connection with a simple query
         result = self.graph.query("RETURN 'Connection successful!' as message")
-        print("Connection test result:", result)
+        logger.debug("Connection test result: %s", result)
+        
+        self.ensure_indexes()
+        
+        # Keep the schema in-process; prompts are built from this copy
+        # until refresh_schema() is called
+        self._schema_cache = self.graph.get_schema
         
         # Set up Azure OpenAI LLM
         self.llm = AzureChatOpenAI(
@@ -55,21 +99,24 @@ class MedicalRAGSystem:
             azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
             api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
             temperature=0.1,
-            max_tokens=1000
+            max_tokens=1000,
+            streaming=True  # lets the answer be shown token by token
         )
         
-        print("✓ Connections established successfully!")
+        logger.info("✓ Connections established successfully!")
         
     def setup_rag_system(self):
         """Set up RAG system for knowledge graph querying"""
         if not self.graph or not self.llm:
             raise ValueError("Connections must be established first. Call setup_connections().")
             
+        self.load_disease_index()
+        
         try:
             # Try using the new GraphCypherQAChain from langchain_neo4j
             from langchain_neo4j import GraphCypherQAChain
             
-            print("Setting up knowledge graph RAG system with langchain_neo4j...")
+            logger.info("Setting up knowledge graph RAG system with langchain_neo4j...")
             
             # Set up GraphCypherQAChain for knowledge graph querying
             self.graph_qa_chain = GraphCypherQAChain.from_llm(
@@ -80,10 +127,10 @@ class MedicalRAGSystem:
                 allow_dangerous_requests=True  # Required for security acknowledgment
             )
             
-            print("✓ Graph QA chain setup complete!")
+            logger.info("✓ Graph QA chain setup complete!")
             
         except ImportError:
-            print("langchain_neo4j GraphCypherQAChain not available, trying community version...")
+            logger.warning("langchain_neo4j GraphCypherQAChain not available, trying community version...")
             from langchain_community.chains.graph_qa.cypher import GraphCypherQAChain
             
             # Fallback to community version with proper error handling
@@ -95,21 +142,42 @@ class MedicalRAGSystem:
                     return_intermediate_steps=True,
                     allow_dangerous_requests=True
                 )
-                print("✓ Community Graph QA chain setup complete!")
+                logger.info("✓ Community Graph QA chain setup complete!")
             except Exception as e:
-                print(f"Error with community version: {e}")
+                logger.error("Error with community version: %s", e)
                 self._setup_simple_graph_qa()
 
         except Exception as e:
-            print(f"Unexpected error: {e}")
-            print("Setting up simple function-based approach...")
+            logger.error("Unexpected error: %s", e)
+            logger.info("Setting up simple function-based approach...")
             self._setup_simple_graph_qa()
             
+    def ensure_indexes(self):
+        """Create the Disease name index used for exact lookups if missing"""
+        for statement in NAME_INDEX_STATEMENTS:
+            try:
+                self.graph.query(statement)
+            except Exception as e:
+                # e.g. a read-only user; queries still work, just without the index
+                logger.warning("Could not create index (%s): %s", statement, e)
+        
+    def load_disease_index(self):
+        """Load all Disease names so conditions can be resolved to exact names in-process"""
+        from utils import DiseaseIndex
+        
+        try:
+            self.disease_index = DiseaseIndex.from_graph(self.graph)
+            logger.info("✓ Loaded %d disease names", len(self.disease_index))
+        except Exception as e:
+            logger.warning("Could not load disease names: %s", e)
+            self.disease_index = None
+        return self.disease_index
+        
     def _setup_simple_graph_qa(self):
         """Create a simple function-based approach as fallback"""
         def simple_graph_qa(question):
             # Get schema information
-            schema_info = self.graph.get_schema
+            schema_info = self._schema_cache
             
             # Create a simple prompt
             cypher_prompt = f"""
@@ -125,7 +193,7 @@ class MedicalRAGSystem:
             response = self.llm.invoke(cypher_prompt)
             cypher_query = response.content.strip()
             
-            print(f"Generated Cypher: {cypher_query}")
+            logger.debug("Generated Cypher: %s", cypher_query)
             
             # Execute the query
             try:
@@ -136,38 +204,158 @@ class MedicalRAGSystem:
         
         # Store the function as our QA chain
         self.graph_qa_chain = simple_graph_qa
-        print("✓ Simple function-based Graph QA setup complete!")
+        logger.info("✓ Simple function-based Graph QA setup complete!")
         
     def get_schema(self):
         """Get the database schema"""
         if not self.graph:
             raise ValueError("Graph connection not established. Call setup_connections() first.")
-        return self.graph.schema
+        return self._schema_cache
+
+    def refresh_schema(self):
+        """Re-read the schema from Neo4j and rebuild the QA chain around it"""
+        if not self.graph:
+            raise ValueError("Graph connection not established. Call setup_connections() first.")
+        self.graph.refresh_schema()
+        self._schema_cache = self.graph.get_schema
+        if self.graph_qa_chain is not None:
+            # from_llm captured the old schema text
+            self.setup_rag_system()
+        return self._schema_cache
         
     def test_basic_query(self, question="What are the symptoms of diabetes?"):
         """Test the GraphCypherQAChain with a sample query"""
         if not self.graph_qa_chain:
             raise ValueError("RAG system not set up. Call setup_rag_system() first.")
             
-        print(f"Testing with question: {question}")
-        print("-" * 50)
+        logger.debug("Testing with question: %s", question)
         
         result = self.graph_qa_chain.invoke({"query": question})
-        print("Result:", result)
+        logger.info("Result: %s", result)
         return result
 
     def initialize_system(self):
         """Initialize the complete system"""
-        print("🚀 Initializing Medical RAG System...")
+        logger.info("🚀 Initializing Medical RAG System...")
         self.setup_connections()
         self.setup_rag_system()
-        print("✅ System initialization complete!")
+        logger.info("✅ System initialization complete!")
         return self
 
 
+class ConnectionWarmer:
+    """Keep Neo4j and Azure OpenAI connections warm while the user is typing
+    
+    schedule() is called whenever the chat loop waits for input. Once the
+    loop has been idle for idle_after seconds, a background thread pings
+    Neo4j and the LLM so the next question does not pay for reconnecting.
+    Nothing is sent while a question is being answered.
+    """
+
+    def __init__(self, medical_rag, idle_after=5.0):
+        self.medical_rag = medical_rag
+        self.idle_after = idle_after
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="connection-warmer")
+        self._busy = threading.Event()
+        self._stopped = threading.Event()
+        self._last_activity = time.monotonic()
+        self._pending = None
+
+    def mark_busy(self):
+        """Call when a question starts processing"""
+        self._busy.set()
+        self._last_activity = time.monotonic()
+
+    def schedule(self):
+        """Call when the loop goes back to waiting for input"""
+        self._busy.clear()
+        self._last_activity = time.monotonic()
+        if self._pending is None or self._pending.done():
+            self._pending = self._executor.submit(self._warm)
+
+    def shutdown(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _idle(self):
+        return (
+            not self._busy.is_set()
+            and time.monotonic() - self._last_activity >= self.idle_after
+        )
+
+    def _warm(self):
+        # Wait until the loop has been idle for idle_after seconds. Questions
+        # answered in the meantime push the deadline back rather than ending
+        # this task, since schedule() does not submit while one is pending.
+        while True:
+            if self._busy.is_set():
+                delay = self.idle_after
+            else:
+                delay = self.idle_after - (time.monotonic() - self._last_activity)
+                if delay <= 0:
+                    break
+            if self._stopped.wait(delay):
+                return
+        try:
+            self.medical_rag.graph.query("RETURN 1")
+            if self._idle():
+                self.medical_rag.llm.invoke("ping", max_tokens=1)
+        except Exception as e:
+            logger.debug("Connection warm-up failed: %s", e)
+
+
+def _configure_logging(*loggers):
+    """Send this package's log records to stdout for the interactive CLI
+    
+    stdout is also where streamed answers go, so banners and answers come out
+    in order. The level comes from MEDICAL_RAG_LOG_LEVEL (default INFO);
+    third-party loggers stay at the root default of WARNING.
+    """
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    level = os.getenv("MEDICAL_RAG_LOG_LEVEL", "INFO").upper()
+    for package_logger in loggers:
+        package_logger.setLevel(level)
+
+
+def _print_condition_symptoms(symptoms_by_name):
+    """Print the result of MedicalQueryHelper.get_symptoms_for_conditions"""
+    for name, records in symptoms_by_name.items():
+        print(f"\n🔍 {name}:")
+        if not records:
+            print("  No matching conditions found.")
+        for record in records:
+            print(f"  - {record['condition']}: {', '.join(record['symptoms'])}")
+
+
+async def answer_questions(medical_rag, optimized_chain, questions):
+    """Answer a batch of questions concurrently, reporting failures per question"""
+    # Live chain output and streamed tokens of concurrent questions would
+    # interleave, so a batch prints each question's Cypher once it is done
+    single = len(questions) == 1
+    if optimized_chain.is_available():
+        tasks = [optimized_chain.aask(question, show_cypher=single, stream=single) for question in questions]
+    else:
+        tasks = [asyncio.to_thread(medical_rag.test_basic_query, question) for question in questions]
+    
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for question, result in zip(questions, results):
+        if isinstance(result, Exception):
+            print(f"❌ Error processing question '{question}': {str(result)}")
+        elif not single and isinstance(result, dict) and result.get("intermediate_steps"):
+            print(f"\n🔎 Cypher for '{question}':\n{result['intermediate_steps'][0]['query']}")
+    return results
+
+
 def main():
     """Main function to demonstrate system setup"""
-    from utils import create_optimized_chain
+    from utils import create_medical_query_helper, create_optimized_chain, logger as utils_logger
+    
+    _configure_logging(logger, utils_logger)
+    
+    try:
+        import readline  # noqa: F401 -- line editing and history for input()
+    except ImportError:
+        pass
     
     # Create and initialize the system
     medical_rag = MedicalRAGSystem()
@@ -179,7 +367,10 @@ def main():
     
     # Create optimized chain with better templates
     print("\n🔧 Setting up optimized query chain...")
-    optimized_chain = create_optimized_chain(medical_rag.llm, medical_rag.graph)
+    optimized_chain = create_optimized_chain(
+        medical_rag.llm, medical_rag.graph, disease_index=medical_rag.disease_index
+    )
+    query_helper = create_medical_query_helper(medical_rag.graph, disease_index=medical_rag.disease_index)
     
     # Let's first check what diseases are available in the database
     print("\n🔍 Checking available diseases (first 10)...")
@@ -195,33 +386,55 @@ def main():
     print("\n🩺 Medical RAG Chat System")
     print("=" * 50)
     print("Ask medical questions and get answers from the knowledge graph.")
+    print("Type 'symptoms: flu, asthma' to look up several conditions at once.")
+    print("Separate several questions with ';' to ask them concurrently.")
     print("Press Ctrl+C to exit the chat.")
     print("⚠️  Always consult healthcare professionals for medical advice.")
     print("=" * 50)
     
+    # A plain event loop (rather than asyncio.run) keeps Ctrl+C at the
+    # input() prompt raising KeyboardInterrupt immediately
+    loop = asyncio.new_event_loop()
+    warmer = ConnectionWarmer(medical_rag)
     try:
         while True:
             print("\n" + "-" * 30)
+            warmer.schedule()
             user_question = input("🧪 Enter your medical question: ").strip()
+            warmer.mark_busy()
             
             if not user_question:
                 print("❌ Please enter a valid question.")
                 continue
             
-            print(f"\n🤖 Processing: {user_question}")
+            if user_question.lower().startswith("symptoms:"):
+                conditions = [name.strip() for name in user_question.split(":", 1)[1].split(",") if name.strip()]
+                if not conditions:
+                    print("❌ Please list at least one condition.")
+                    continue
+                try:
+                    # One UNWIND query, so the pool (with execute_query's
+                    # retries) serves it better than a held session
+                    symptoms_by_name = loop.run_until_complete(query_helper.aget_symptoms_for_conditions(conditions))
+                    _print_condition_symptoms(symptoms_by_name)
+                except Exception as e:
+                    print(f"❌ Error looking up symptoms: {str(e)}")
+                continue
+            
+            # Several questions separated by ';' are answered concurrently
+            questions = [q.strip() for q in user_question.split(";") if q.strip()]
+            for question in questions:
+                print(f"\n🤖 Processing: {question}")
             print("-" * 50)
             
-            try:
-                if optimized_chain.is_available():
-                    optimized_chain.ask_medical_question_clean(user_question, show_cypher=True)
-                else:
-                    medical_rag.test_basic_query(user_question)
-            except Exception as e:
-                print(f"❌ Error processing question: {str(e)}")
+            loop.run_until_complete(answer_questions(medical_rag, optimized_chain, questions))
             
     except KeyboardInterrupt:
         print("\n\n👋 Thank you for using the Medical RAG System!")
         print("Stay healthy and always consult healthcare professionals!")
+    finally:
+        warmer.shutdown()
+        loop.close()
     
     return medical_rag
 
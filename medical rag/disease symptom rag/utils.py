@@ -3,10 +3,44 @@ Utility functions and templates for Medical RAG System
 Contains helper functions for medical queries and prompt templates
 """
 
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManager, StdOutCallbackHandler
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import patch_config
 from langchain_neo4j import GraphCypherQAChain
+from langchain_neo4j.chains.graph_qa.cypher import construct_schema, extract_cypher
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# Retry policy for queries on an explicit Neo4j session: up to 3 attempts
+# with exponential backoff (1s, 2s, ... capped at 8s), only for transient
+# Bolt/cluster failures. Neo4jGraph.query needs none of this: it goes
+# through driver.execute_query, which already retries for up to 30s.
+neo4j_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=1, max=8),
+    retry=retry_if_exception_type((ServiceUnavailable, SessionExpired, TransientError)),
+    reraise=True
+)
 
 
+# Closing line of the Cypher prompt; ask_many swaps it for MULTI_QUESTION_INSTRUCTIONS
+SINGLE_QUERY_INSTRUCTION = "Generate ONLY the Cypher query without any explanation:"
+
 # Advanced Cypher Generation Template with Query Optimization
 ADVANCED_CYPHER_TEMPLATE = """You are an expert Neo4j Cypher query generator for a medical knowledge graph.
 
@@ -28,6 +62,7 @@ CRITICAL RULES:
 3. Use collect() to group results
 4. Always add LIMIT for multiple results
 5. Follow the relationship pattern through intermediate nodes
+6. If the question gives the exact condition name in the database, match it with d.name = "exact name" instead of toLower() and CONTAINS
 
 QUERY PATTERNS:
 
@@ -61,9 +96,9 @@ OPTIONAL MATCH (dtr:DiseaseTreatmentRelationship)-[:FOR_DISEASE]->(d), (dtr)-[:F
 RETURN d.name as condition, collect(DISTINCT s.name) as symptoms, collect(DISTINCT t.name) as treatments
 LIMIT 5
 
-Question: {question}
+Question: {question}{condition_hint}
 
-Generate ONLY the Cypher query without any explanation:"""
+""" + SINGLE_QUERY_INSTRUCTION
 
 # Create an improved QA prompt template for better responses
 QA_TEMPLATE = """You are a helpful medical assistant. Based on the following information from a medical knowledge graph, provide a clear and helpful response to the patient's question.
@@ -77,143 +112,682 @@ Please provide a response as if you are talking to a patient. Be empathetic, cle
 
 Answer:"""
 
+# Prompt objects are built once at import and shared by every chain
+# condition_hint optionally carries the exact Disease name found in the
+# question (see OptimizedMedicalChain._condition_hint); it is empty otherwise
+ADVANCED_CYPHER_PROMPT = PromptTemplate(
+    input_variables=["schema", "question"],
+    partial_variables={"condition_hint": ""},
+    template=ADVANCED_CYPHER_TEMPLATE
+)
+
+QA_PROMPT = PromptTemplate(
+    input_variables=["context", "question"],
+    template=QA_TEMPLATE
+)
+
+
+# Closing line of the prompt when several numbered questions share it
+MULTI_QUESTION_INSTRUCTIONS = """There are {count} numbered questions above. Generate ONLY one Cypher query per question, without any explanation,
+in the same order, separated by a line containing only ---"""
+
+
+# Response banners, formatted lazily by logging from a {"question", "answer"}
+# mapping so each response is one write
+_BAR = "=" * 60
+RESPONSE_HEADER = f"\n{_BAR}\n🩺 MEDICAL ASSISTANT RESPONSE\n{_BAR}\n📋 Question: %(question)s"
+RESPONSE_FOOTER = f"{_BAR}\n⚠️  Always consult healthcare professionals for medical advice.\n{_BAR}"
+RESPONSE_BANNER = RESPONSE_HEADER + "\n💡 Answer: %(answer)s\n" + RESPONSE_FOOTER
+
+# Generated Cypher is well under 150 tokens, so the Cypher step gets a much
+# smaller budget than answer synthesis and stops at the end of the query
+CYPHER_MAX_TOKENS = 200
+CYPHER_STOP = ["\n\n", "Question:"]
+
+# Tag on the answer-synthesis LLM calls, used to stream only those tokens
+QA_STREAM_TAG = "medical_qa_answer"
+
+
+class AnswerStreamHandler(BaseCallbackHandler):
+    """Write QA answer tokens to stdout as they arrive, logging the response header first"""
+
+    def __init__(self, question, prefix="💡 Answer: "):
+        self.question = question
+        self.prefix = prefix
+        self._run_ids = set()
+        self.streamed = False
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        self._start(run_id, tags)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs):
+        self._start(run_id, tags)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id not in self._run_ids:
+            return
+        if not self.streamed:
+            self.streamed = True
+            sys.stdout.flush()
+            logger.info(RESPONSE_HEADER, {"question": self.question})
+            sys.stdout.write(self.prefix)
+        sys.stdout.write(token)
+        sys.stdout.flush()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def _start(self, run_id, tags):
+        if tags and QA_STREAM_TAG in tags:
+            self._run_ids.add(run_id)
+
+    def _end(self, run_id):
+        if run_id in self._run_ids:
+            self._run_ids.discard(run_id)
+            if self.streamed:
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+
+
+class CypherStdOutHandler(StdOutCallbackHandler):
+    """StdOutCallbackHandler without "> Finished chain.", which would land between answer and footer"""
+
+    def on_chain_end(self, outputs, **kwargs):
+        pass
+
+
+def _forward_callbacks(runnable):
+    """Wrap runnable so a callbacks= argument (ignored by RunnableSequence) lands in its config"""
+    def invoke(inputs, config, callbacks=None, **kwargs):
+        return runnable.invoke(inputs, patch_config(config, callbacks=callbacks), **kwargs)
+    
+    async def ainvoke(inputs, config, callbacks=None, **kwargs):
+        return await runnable.ainvoke(inputs, patch_config(config, callbacks=callbacks), **kwargs)
+    
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+
+class _TTLCache:
+    """Small thread-unsafe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiseaseIndex:
+    """In-process index of Disease names for resolving user input to exact names"""
+
+    def __init__(self, names):
+        self._by_lower = {name.lower(): name for name in names if name}
+        # Longest names first so "type 2 diabetes" is preferred over "diabetes"
+        lowered = sorted(self._by_lower, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(re.escape(name) for name in lowered) + r")(?!\w)"
+        ) if lowered else None
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Load every Disease name from the graph"""
+        records = graph.query("MATCH (d:Disease) RETURN d.name AS name")
+        return cls(record["name"] for record in records)
+
+    def resolve(self, name):
+        """Return the exact Disease name for a case-insensitive match of name, or None"""
+        return self._by_lower.get(name.strip().lower())
+
+    def find_in_text(self, text):
+        """Return the exact name of the first Disease mentioned in text, or None"""
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text.lower())
+        return self._by_lower[match.group(0)] if match else None
+
+    def __contains__(self, name):
+        return name.lower() in self._by_lower
+
+    def __len__(self):
+        return len(self._by_lower)
+
 
 class MedicalQueryHelper:
     """Helper class for medical database queries"""
     
-    def __init__(self, graph):
+    # Same matching rule as _condition_filter: names resolved by the disease
+    # index come in $exact and are matched with equality, the rest use CONTAINS
+    SYMPTOMS_FOR_CONDITIONS_QUERY = """
+        UNWIND $exact AS pair
+        MATCH (dsr:DiseaseSymptomRelationship)-[:FOR_DISEASE]->(d:Disease), 
+              (dsr)-[:FOR_SYMPTOM]->(s:Symptom)
+        WHERE d.name = pair.condition
+        RETURN pair.name AS name, d.name as condition, collect(s.name) as symptoms
+        UNION ALL
+        UNWIND $names AS name
+        MATCH (dsr:DiseaseSymptomRelationship)-[:FOR_DISEASE]->(d:Disease), 
+              (dsr)-[:FOR_SYMPTOM]->(s:Symptom)
+        WHERE toLower(d.name) CONTAINS toLower(name)
+        RETURN name, d.name as condition, collect(s.name) as symptoms
+        """
+    
+    def __init__(self, graph, disease_index=None):
         self.graph = graph
+        self.disease_index = disease_index
+        self._session = None
         
+    def __enter__(self):
+        """Hold one Neo4j session for several queries in the with block (not reentrant)"""
+        if self._session is not None:
+            raise RuntimeError("MedicalQueryHelper already holds a session; nested with blocks are not supported")
+        self._session = self.graph._driver.session(database=self.graph._database)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        session, self._session = self._session, None
+        session.close()
+        return False
+
+    def _query(self, query, params=None):
+        """Run a Cypher query on the held session, or through the pool"""
+        if self._session is not None:
+            return self._session_query(query, params)
+        return self.graph.query(query, params=params or {})
+
+    @neo4j_retry
+    def _session_query(self, query, params=None):
+        """Run a Cypher query on the held session, retrying transient failures"""
+        return [record.data() for record in self._session.run(query, params or {})]
+
+    async def aquery(self, query, params=None):
+        """Run a Cypher query through the pool in a worker thread"""
+        return await asyncio.to_thread(self.graph.query, query, params or {})
+
+    def _condition_filter(self, condition_name):
+        """Return a WHERE clause on d.name and its $condition value, exact when the index resolves the name"""
+        exact_name = self.disease_index.resolve(condition_name) if self.disease_index else None
+        if exact_name:
+            return "d.name = $condition", exact_name
+        return "toLower(d.name) CONTAINS toLower($condition)", condition_name
+
     def get_symptoms_for_condition(self, condition_name):
         """Get all symptoms for a specific medical condition"""
+        condition_filter, condition = self._condition_filter(condition_name)
         query = f"""
         MATCH (dsr:DiseaseSymptomRelationship)-[:FOR_DISEASE]->(d:Disease), 
               (dsr)-[:FOR_SYMPTOM]->(s:Symptom)
-        WHERE toLower(d.name) CONTAINS toLower('{condition_name}')
+        WHERE {condition_filter}
         RETURN d.name as condition, collect(s.name) as symptoms
         """
-        result = self.graph.query(query)
+        result = self._query(query, params={"condition": condition})
         return result
 
+    def get_symptoms_for_conditions(self, condition_names):
+        """Get symptoms for several conditions in one round trip, keyed by input name"""
+        names = list(dict.fromkeys(condition_names))
+        result = self._query(self.SYMPTOMS_FOR_CONDITIONS_QUERY, params=self._conditions_params(names))
+        return self._group_by_name(names, result)
+
+    async def aget_symptoms_for_conditions(self, condition_names):
+        """Async version of get_symptoms_for_conditions"""
+        names = list(dict.fromkeys(condition_names))
+        result = await self.aquery(self.SYMPTOMS_FOR_CONDITIONS_QUERY, params=self._conditions_params(names))
+        return self._group_by_name(names, result)
+
+    def _conditions_params(self, names):
+        """Split names into exact Disease names and CONTAINS patterns for SYMPTOMS_FOR_CONDITIONS_QUERY"""
+        exact, contains = [], []
+        for name in names:
+            exact_name = self.disease_index.resolve(name) if self.disease_index else None
+            if exact_name:
+                exact.append({"name": name, "condition": exact_name})
+            else:
+                contains.append(name)
+        return {"exact": exact, "names": contains}
+
+    @staticmethod
+    def _group_by_name(names, result):
+        symptoms_by_name = {name: [] for name in names}
+        for record in result:
+            symptoms_by_name[record["name"]].append(
+                {"condition": record["condition"], "symptoms": record["symptoms"]}
+            )
+        return symptoms_by_name
+
     def get_treatments_for_condition(self, condition_name):
         """Get all treatments for a specific medical condition"""
+        condition_filter, condition = self._condition_filter(condition_name)
         query = f"""
         MATCH (dtr:DiseaseTreatmentRelationship)-[:FOR_DISEASE]->(d:Disease), 
               (dtr)-[:FOR_TREATMENT]->(t:Treatment)
-        WHERE toLower(d.name) CONTAINS toLower('{condition_name}')
+        WHERE {condition_filter}
         RETURN d.name as condition, collect(t.name) as treatments
         """
-        result = self.graph.query(query)
+        result = self._query(query, params={"condition": condition})
         return result
 
     def find_conditions_by_symptoms(self, symptoms_list):
         """Find medical conditions that have any of the specified symptoms"""
-        query = f"""
+        query = """
         MATCH (dsr:DiseaseSymptomRelationship)-[:FOR_DISEASE]->(d:Disease), 
               (dsr)-[:FOR_SYMPTOM]->(s:Symptom)
-        WHERE toLower(s.name) IN [{', '.join([f"'{symptom.lower()}'" for symptom in symptoms_list])}]
+        WHERE toLower(s.name) IN $symptoms
         RETURN d.name as condition, collect(s.name) as matching_symptoms, count(s) as symptom_count
         ORDER BY symptom_count DESC
         LIMIT 10
         """
-        result = self.graph.query(query)
+        result = self._query(query, params={"symptoms": [symptom.lower() for symptom in symptoms_list]})
         return result
 
 
 class OptimizedMedicalChain:
     """Optimized chain setup for medical queries"""
     
-    def __init__(self, llm, graph):
+    def __init__(self, llm, graph, cache_size=512, cache_ttl=3600, cypher_cache_size=1024, disease_index=None):
         self.llm = llm
         self.graph = graph
+        self.disease_index = disease_index
         self.optimized_chain = None
-        self.optimized_chain_verbose = None
+        
+        # The schema rarely changes within a session, so it is read once and
+        # bound into the prompt used outside the chain; see refresh_schema()
+        self._schema = self._chain_schema(graph)
+        self.cypher_prompt = None
+        
+        # Answers for repeated questions, keyed by the normalized question text
+        self._cache = _TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Generated Cypher, keyed more loosely (punctuation ignored) so new
+        # phrasings of a known question skip the Cypher generation LLM call
+        self._cypher_cache = _TTLCache(maxsize=cypher_cache_size)
+        self.cypher_cache_hits = 0
+        
         self._setup_chains()
         
     def _setup_chains(self):
         """Set up optimized chains with improved templates"""
         try:
-            # Create a clean version without verbose output
+            # Prompt for the direct LLM paths (ask_many, submit_batch). The
+            # chain itself always fills "schema" with its own graph_schema,
+            # which would override a partial, so it gets the plain prompt.
+            self.cypher_prompt = ADVANCED_CYPHER_PROMPT.partial(schema=self._schema)
+            
+            # A single quiet chain; verbose output is switched on per call
+            # with a callback handler (see _run_config)
             self.optimized_chain = GraphCypherQAChain.from_llm(
-                self.llm,
-                graph=self.graph,
-                verbose=False,  # Turn off verbose to avoid duplicate Cypher output
-                allow_dangerous_requests=True,
-                cypher_prompt=PromptTemplate(
-                    input_variables=["schema", "question"], 
-                    template=ADVANCED_CYPHER_TEMPLATE
-                ),
-                qa_prompt=PromptTemplate(
-                    input_variables=["context", "question"],
-                    template=QA_TEMPLATE
-                ),
-                return_intermediate_steps=True
-            )
-
-            # Also create a verbose version for debugging when needed
-            self.optimized_chain_verbose = GraphCypherQAChain.from_llm(
-                self.llm,
+                cypher_llm=self.llm.bind(max_tokens=CYPHER_MAX_TOKENS, stop=CYPHER_STOP),
+                qa_llm=self.llm.with_config(tags=[QA_STREAM_TAG]),
                 graph=self.graph,
-                verbose=True,  # Keep verbose for debugging
+                verbose=False,
                 allow_dangerous_requests=True,
-                cypher_prompt=PromptTemplate(
-                    input_variables=["schema", "question"], 
-                    template=ADVANCED_CYPHER_TEMPLATE
-                ),
-                qa_prompt=PromptTemplate(
-                    input_variables=["context", "question"],
-                    template=QA_TEMPLATE
-                ),
+                cypher_prompt=ADVANCED_CYPHER_PROMPT,
+                qa_prompt=QA_PROMPT,
                 return_intermediate_steps=True
             )
             
-            print("✓ Advanced templates and chains created!")
+            self._wrap_cypher_generation(self.optimized_chain)
+            self.optimized_chain.qa_chain = _forward_callbacks(self.optimized_chain.qa_chain)
+            
+            logger.info("✓ Advanced templates and chains created!")
             
         except Exception as e:
-            print(f"Error setting up optimized chains: {e}")
+            logger.error("Error setting up optimized chains: %s", e)
             self.optimized_chain = None
-            self.optimized_chain_verbose = None
 
-    def ask_medical_question_clean(self, question, show_cypher=True):
-        """Ask a medical question with clean output"""
+    def ask_medical_question_clean(self, question, show_cypher=True, stream=False):
+        """Ask a medical question with clean output, optionally streaming the answer"""
         if not self.optimized_chain:
             raise ValueError("Optimized chains not available. Check setup.")
             
-        # Always use verbose chain to show the green query building process
-        if self.optimized_chain_verbose:
-            result = self.optimized_chain_verbose.invoke({"query": question})
-        else:
-            result = self.optimized_chain.invoke({"query": question})
-        
-        # Always show the final answer regardless of which chain was used
-        print("\n" + "="*60)
-        print("🩺 MEDICAL ASSISTANT RESPONSE")
-        print("="*60)
-        print(f"📋 Question: {question}")
-        print(f"💡 Answer: {result['result']}")
-        print("="*60)
-        print("⚠️  Always consult healthcare professionals for medical advice.")
-        print("="*60)
+        key = self._cache_key(question)
+        result = self._cache_lookup(key)
+        streamed = False
+        if result is None:
+            config = self._run_config(show_cypher, stream, question)
+            result = self.optimized_chain.invoke(
+                {"query": question, "condition_hint": self._condition_hint(question)},
+                config=config
+            )
+            # The chain echoes its inputs back; the hint is internal to the Cypher prompt
+            result.pop("condition_hint", None)
+            self._cache_store(key, result)
+            streamed = self._streamed(config)
         
+        self._print_response(question, result, include_answer=not streamed)
         return result
 
+    async def aask(self, question, show_cypher=True, stream=False):
+        """Async version of ask_medical_question_clean"""
+        if not self.optimized_chain:
+            raise ValueError("Optimized chains not available. Check setup.")
+            
+        key = self._cache_key(question)
+        result = self._cache_lookup(key)
+        streamed = False
+        if result is None:
+            config = self._run_config(show_cypher, stream, question)
+            result = await self.optimized_chain.ainvoke(
+                {"query": question, "condition_hint": self._condition_hint(question)},
+                config=config
+            )
+            # The chain echoes its inputs back; the hint is internal to the Cypher prompt
+            result.pop("condition_hint", None)
+            self._cache_store(key, result)
+            streamed = self._streamed(config)
+        
+        self._print_response(question, result, include_answer=not streamed)
+        return result
+
+    @staticmethod
+    def _chain_schema(graph):
+        """Schema text exactly as GraphCypherQAChain.from_llm builds it"""
+        return construct_schema(graph.get_structured_schema, [], [])
+
+    def _condition_hint(self, question):
+        """Return the Cypher prompt note naming the exact Disease in the question, or an empty string"""
+        exact_name = self.disease_index.find_in_text(question) if self.disease_index else None
+        if not exact_name:
+            return ""
+        return f'\n(Exact condition name in the database: "{exact_name}")'
+
+    def refresh_schema(self):
+        """Re-read the graph schema and rebuild the chains around it"""
+        self.graph.refresh_schema()
+        self._schema = self._chain_schema(self.graph)
+        self._setup_chains()
+        self.cache_clear()
+
+    @staticmethod
+    def _run_config(show_cypher, stream=False, question=None):
+        """Callbacks for one chain call: Cypher printout and/or answer streaming"""
+        # Not inheritable, so the inner prompt/LLM/parser runs print nothing
+        callbacks = CallbackManager([CypherStdOutHandler()] if show_cypher else [])
+        if stream:
+            callbacks.add_handler(AnswerStreamHandler(question))
+        return {"callbacks": callbacks}
+
+    @staticmethod
+    def _streamed(config):
+        """Whether the answer was already written out by an AnswerStreamHandler"""
+        return any(isinstance(handler, AnswerStreamHandler) and handler.streamed for handler in config["callbacks"].handlers)
+
+    def _cache_lookup(self, key):
+        """Return the cached result for key, updating the hit/miss counters"""
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+        return result
+
+    def _cache_store(self, key, result):
+        with self._cache_lock:
+            self._cache.set(key, result)
+
+    def _print_response(self, question, result, include_answer=True):
+        """Show the final answer, or just the footer after a streamed answer"""
+        if include_answer:
+            logger.info(RESPONSE_BANNER, {"question": question, "answer": result["result"]})
+        else:
+            logger.info(RESPONSE_FOOTER)
+
+    def ask_many(self, questions):
+        """Generate Cypher for several questions with a single LLM request, then run it"""
+        if not questions:
+            return []
+            
+        numbered = "\n".join(
+            f"{index}) {question}{self._condition_hint(question)}" for index, question in enumerate(questions, 1)
+        )
+        prompt = self.cypher_prompt.format(question=numbered)
+        prompt = prompt[:-len(SINGLE_QUERY_INSTRUCTION)] + MULTI_QUESTION_INSTRUCTIONS.format(count=len(questions))
+        
+        response = self.llm.invoke(prompt)
+        # Drop code fences first, the model may wrap all queries in a single block
+        content = re.sub(r"```(?:cypher)?", "", response.content)
+        queries = [part.strip() for part in re.split(r"^\s*---\s*$", content, flags=re.MULTILINE) if part.strip()]
+        if len(queries) != len(questions):
+            raise ValueError(f"Expected {len(questions)} Cypher queries, got {len(queries)}")
+        
+        results = []
+        for question, run in zip(questions, self._run_cypher_queries(queries)):
+            results.append({"question": question, **run})
+        return results
+
+    def submit_batch(self, questions, client=None):
+        """Submit Cypher generation for many questions as one Azure OpenAI batch job; returns the batch id"""
+        client = client or _create_batch_client()
+        deployment = os.getenv("AZURE_OPENAI_BATCH_DEPLOYMENT") or os.getenv("AZURE_OPENAI_DEPLOYMENT")
+        
+        lines = []
+        for index, question in enumerate(questions):
+            prompt = self.cypher_prompt.format(
+                question=question, condition_hint=self._condition_hint(question)
+            )
+            lines.append(json.dumps({
+                "custom_id": f"question-{index}",
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": deployment,
+                    "messages": [{"role": "user", "content": prompt}],
+                    # Same sampling and limits as the chain's Cypher step
+                    "temperature": getattr(self.llm, "temperature", 0.1),
+                    "max_tokens": CYPHER_MAX_TOKENS,
+                    "stop": CYPHER_STOP
+                }
+            }))
+        
+        batch_file = client.files.create(
+            file=("medical_questions.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def wait_for_batch(self, batch_id, client=None, poll_interval=60):
+        """Poll a batch job until it finishes; returns (cypher_by_index, errors_by_index)"""
+        client = client or _create_batch_client()
+        
+        while True:
+            batch = client.batches.retrieve(batch_id)
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                break
+            time.sleep(poll_interval)
+        
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} finished with status '{batch.status}'")
+        
+        cypher_by_index = {}
+        errors_by_index = {}
+        # output_file_id is None when every request failed, error_file_id
+        # when none did
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                index = int(item["custom_id"].rsplit("-", 1)[1])
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    cypher_by_index[index] = extract_cypher(content)
+                else:
+                    errors_by_index[index] = self._batch_error(item)
+        
+        if errors_by_index:
+            logger.warning("Batch %s: %d of %d requests failed",
+                           batch_id, len(errors_by_index), len(cypher_by_index) + len(errors_by_index))
+        return cypher_by_index, errors_by_index
+
+    @staticmethod
+    def _batch_error(item):
+        """Error message of a failed line from a batch output or error file"""
+        error = item.get("error") or (item.get("response") or {}).get("body", {}).get("error") or {}
+        status = (item.get("response") or {}).get("status_code")
+        message = error.get("message") or "Batch request failed"
+        return f"{message} (status {status})" if status else message
+
+    def batch_ask(self, questions, client=None, poll_interval=60):
+        """Generate Cypher for all questions via the Batch API, then run it against Neo4j"""
+        client = client or _create_batch_client()
+        batch_id = self.submit_batch(questions, client=client)
+        cypher_by_index, errors_by_index = self.wait_for_batch(batch_id, client=client, poll_interval=poll_interval)
+        queries = [cypher_by_index.get(index) for index in range(len(questions))]
+        
+        results = []
+        for index, (question, run) in enumerate(zip(questions, self._run_cypher_queries(queries))):
+            if index in errors_by_index:
+                run["error"] = errors_by_index[index]
+            results.append({"question": question, **run})
+        return results
+
+    def _run_cypher_queries(self, queries):
+        """Run several Cypher queries in a single Neo4j session"""
+        runs = []
+        with self.graph._driver.session(database=self.graph._database) as session:
+            for query in queries:
+                if not query:
+                    runs.append({"query": query, "context": [], "error": "No Cypher query generated"})
+                    continue
+                try:
+                    context = [record.data() for record in session.run(query)]
+                    runs.append({"query": query, "context": context, "error": None})
+                except Exception as e:
+                    runs.append({"query": query, "context": [], "error": str(e)})
+        return runs
+
+    def _wrap_cypher_generation(self, chain):
+        """Serve the chain's Cypher generation step from the Cypher cache"""
+        generate = chain.cypher_generation_chain
+        
+        def lookup(inputs):
+            key = self._cypher_cache_key(inputs["question"])
+            with self._cache_lock:
+                cypher = self._cypher_cache.get(key)
+                if cypher is not None:
+                    self.cypher_cache_hits += 1
+            return key, cypher
+        
+        def store(key, cypher):
+            with self._cache_lock:
+                self._cypher_cache.set(key, cypher)
+        
+        # GraphCypherQAChain calls invoke(args, callbacks=...); RunnableLambda
+        # hands such keyword arguments to the function, so pass them on
+        def cached_generate(inputs, config, **kwargs):
+            key, cypher = lookup(inputs)
+            if cypher is None:
+                cypher = generate.invoke(inputs, config, **kwargs)
+                store(key, cypher)
+            return cypher
+        
+        async def acached_generate(inputs, config, **kwargs):
+            key, cypher = lookup(inputs)
+            if cypher is None:
+                cypher = await generate.ainvoke(inputs, config, **kwargs)
+                store(key, cypher)
+            return cypher
+        
+        chain.cypher_generation_chain = RunnableLambda(cached_generate, afunc=acached_generate)
+
+    @staticmethod
+    def _cypher_cache_key(question):
+        return re.sub(r"\W+", " ", question.lower()).strip()
+
+    @staticmethod
+    def _cache_key(question):
+        """Normalize a question so trivially different spellings share a cache entry"""
+        return re.sub(r"\s+", " ", question.strip().lower())
+
+    def cache_clear(self):
+        """Drop all cached answers and Cypher and reset the hit/miss counters"""
+        with self._cache_lock:
+            self._cache.clear()
+            self._cypher_cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.cypher_cache_hits = 0
+
+    def cache_info(self):
+        """Return cache statistics as a dict"""
+        with self._cache_lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+                "cypher_hits": self.cypher_cache_hits,
+                "cypher_size": len(self._cypher_cache)
+            }
+
     def is_available(self):
         """Check if optimized chains are available"""
         return self.optimized_chain is not None
 
 
-def create_medical_query_helper(graph):
+def _create_batch_client():
+    """Create an Azure OpenAI client for the Batch API from the usual environment variables"""
+    from openai import AzureOpenAI
+    
+    return AzureOpenAI(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION")
+    )
+
+
+def create_medical_query_helper(graph, disease_index=None):
     """Factory function to create MedicalQueryHelper"""
-    helper = MedicalQueryHelper(graph)
-    print("✓ Helper functions created for medical queries!")
+    helper = MedicalQueryHelper(graph, disease_index=disease_index)
+    logger.info("✓ Helper functions created for medical queries!")
     return helper
 
 
-def create_optimized_chain(llm, graph):
+def create_optimized_chain(llm, graph, disease_index=None):
     """Factory function to create OptimizedMedicalChain"""
-    chain = OptimizedMedicalChain(llm, graph)
+    chain = OptimizedMedicalChain(llm, graph, disease_index=disease_index)
     if chain.is_available():
-        print("🚀 Improved medical AI assistant chain created!")
+        logger.info("🚀 Improved medical AI assistant chain created!")
     else:
-        print("⚠️ Optimized chain setup failed, using basic functionality.")
+        logger.warning("⚠️ Optimized chain setup failed, using basic functionality.")
     return chain
\ No newline at end of file
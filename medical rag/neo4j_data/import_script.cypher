@@ -6,6 +6,7 @@
 CREATE CONSTRAINT disease_id IF NOT EXISTS FOR (d:Disease) REQUIRE d.id IS UNIQUE;
 CREATE CONSTRAINT symptom_id IF NOT EXISTS FOR (s:Symptom) REQUIRE s.id IS UNIQUE;
 CREATE CONSTRAINT treatment_id IF NOT EXISTS FOR (t:Treatment) REQUIRE t.id IS UNIQUE;
+CREATE INDEX disease_name IF NOT EXISTS FOR (d:Disease) ON (d.name);
 
 // 2. Load Disease nodes
 LOAD CSV WITH HEADERS FROM "file:///diseases.csv" AS row
@@ -4,11 +4,30 @@ from dotenv import load_dotenv
 from langchain_neo4j import Neo4jGraph
 load_dotenv()
 
-graph = Neo4jGraph(
+# One Neo4jGraph (and driver pool) per (uri, username, database)
+_GRAPH_CACHE = {}
+
+
+def get_graph(url, username, password, database=None):
+    key = (url, username, database)
+    if key not in _GRAPH_CACHE:
+        _GRAPH_CACHE[key] = Neo4jGraph(
+            url=url,
+            username=username,
+            password=password,
+            database=database,
+            driver_config={
+                "max_connection_pool_size": int(os.getenv("NEO4J_POOL_SIZE", "32")),
+                "connection_acquisition_timeout": float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+            }
+        )
+    return _GRAPH_CACHE[key]
+
+
+graph = get_graph(
     url=os.getenv("NEO4J_URI"),
     username=os.getenv("NEO4J_USERNAME"),
     password=os.getenv("NEO4J_PASSWORD"),
-
 )
 
 llm = AzureChatOpenAI(
@@ -0,0 +1,308 @@
+"""Tests for the medical RAG helpers, using a fake LLM and a fake graph"""
+
+import json
+import logging
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from neo4j.exceptions import TransientError
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_neo4j.graphs.graph_store import GraphStore
+from pydantic import Field
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "medical rag", "disease symptom rag"))
+
+from utils import DiseaseIndex, MedicalQueryHelper, OptimizedMedicalChain  # noqa: E402
+
+
+CYPHER = "MATCH (d:Disease) RETURN d.name AS condition"
+
+
+class FakeGraph(GraphStore):
+    """In-memory GraphStore that records the queries it is asked to run"""
+
+    def __init__(self, records=None):
+        self.records = records if records is not None else [{"condition": "Diabetes"}]
+        self.queries = []
+        self.params = []
+
+    @property
+    def get_schema(self):
+        return "Node properties:\nDisease {name: STRING}"
+
+    @property
+    def get_structured_schema(self):
+        return {
+            "node_props": {"Disease": [{"property": "name", "type": "STRING"}]},
+            "rel_props": {},
+            "relationships": [],
+        }
+
+    def query(self, query, params={}):
+        self.queries.append(query)
+        self.params.append(params)
+        return self.records
+
+    def refresh_schema(self):
+        pass
+
+    def add_graph_documents(self, graph_documents, include_source=False):
+        pass
+
+
+class RecordingChatModel(FakeListChatModel):
+    """FakeListChatModel that keeps the text of every prompt it receives"""
+
+    prompts: list = Field(default_factory=list)
+    streaming: bool = False
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages[-1].content)
+        return super()._call(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _should_stream(self, **kwargs):
+        # Stand-in for the streaming flag of chat models like AzureChatOpenAI
+        return self.streaming
+
+
+def make_chain(responses, graph=None, disease_index=None, streaming=False):
+    llm = RecordingChatModel(responses=responses, streaming=streaming)
+    return OptimizedMedicalChain(llm, graph or FakeGraph(), disease_index=disease_index)
+
+
+def test_ask_runs_generated_cypher_and_returns_answer():
+    graph = FakeGraph()
+    chain = make_chain([CYPHER, "Diabetes causes thirst."], graph)
+
+    result = chain.ask_medical_question_clean("What are symptoms of diabetes?", show_cypher=False)
+
+    assert result["result"] == "Diabetes causes thirst."
+    assert result["intermediate_steps"][0]["query"] == CYPHER
+    assert graph.queries == [CYPHER]
+
+
+def test_cypher_cache_skips_generation_for_rephrased_question():
+    graph = FakeGraph()
+    chain = make_chain([CYPHER, "First answer.", "Second answer."], graph)
+
+    chain.ask_medical_question_clean("What are symptoms of diabetes?", show_cypher=False)
+    result = chain.ask_medical_question_clean("what are symptoms of diabetes", show_cypher=False)
+
+    # The third fake response went to the QA step, not to Cypher generation
+    assert result["result"] == "Second answer."
+    assert graph.queries == [CYPHER, CYPHER]
+    assert chain.cache_info()["cypher_hits"] == 1
+
+
+def test_answer_cache_returns_cached_result():
+    chain = make_chain([CYPHER, "Only answer."])
+
+    first = chain.ask_medical_question_clean("What are symptoms of diabetes?", show_cypher=False)
+    second = chain.ask_medical_question_clean("  what are   SYMPTOMS of diabetes? ", show_cypher=False)
+
+    assert second is first
+    assert chain.cache_info()["hits"] == 1
+
+
+async def _aask(chain, question):
+    return await chain.aask(question, show_cypher=False)
+
+
+def test_aask_runs_generated_cypher():
+    import asyncio
+
+    graph = FakeGraph()
+    chain = make_chain([CYPHER, "Async answer."], graph)
+
+    result = asyncio.run(_aask(chain, "What are symptoms of diabetes?"))
+
+    assert result["result"] == "Async answer."
+    assert graph.queries == [CYPHER]
+
+
+def test_condition_hint_reaches_only_the_cypher_prompt():
+    index = DiseaseIndex(["Diabetes", "Asthma"])
+    chain = make_chain([CYPHER, "Answer."], disease_index=index)
+
+    result = chain.ask_medical_question_clean("What are symptoms of diabetes?", show_cypher=False)
+
+    cypher_prompt, qa_prompt = chain.llm.prompts
+    assert 'Exact condition name in the database: "Diabetes"' in cypher_prompt
+    assert "Exact condition name" not in qa_prompt
+    assert result["query"] == "What are symptoms of diabetes?"
+    assert "condition_hint" not in result
+
+
+def test_disease_index_resolves_only_case_insensitive_matches():
+    index = DiseaseIndex(["Type 2 Diabetes", "Asthma"])
+
+    assert index.resolve(" type 2 DIABETES ") == "Type 2 Diabetes"
+    assert index.resolve("type 3 diabetes") is None
+    assert index.find_in_text("Is asthma contagious?") == "Asthma"
+
+
+def test_direct_prompt_uses_the_same_schema_as_the_chain():
+    chain = make_chain([CYPHER])
+
+    prompt = chain.cypher_prompt.format(question="What is asthma?")
+
+    assert chain.optimized_chain.graph_schema in prompt
+
+
+def test_stream_falls_back_to_full_banner_when_llm_does_not_stream(capsys, caplog):
+    chain = make_chain([CYPHER, "Diabetes causes thirst."])
+
+    with caplog.at_level(logging.INFO, logger="utils"):
+        chain.ask_medical_question_clean("What are symptoms of diabetes?", show_cypher=False, stream=True)
+
+    assert "Answer:" not in capsys.readouterr().out
+    assert "💡 Answer: Diabetes causes thirst." in caplog.text
+
+
+def test_streamed_answer_follows_the_response_header(capsys, caplog):
+    chain = make_chain([CYPHER, "Diabetes causes thirst."], streaming=True)
+
+    with caplog.at_level(logging.INFO, logger="utils"):
+        chain.ask_medical_question_clean("What are symptoms of diabetes?", show_cypher=False, stream=True)
+
+    assert capsys.readouterr().out == "💡 Answer: Diabetes causes thirst.\n"
+    header, footer = (record.getMessage() for record in caplog.records)
+    assert "📋 Question: What are symptoms of diabetes?" in header
+    assert "Answer:" not in header + footer
+
+
+class FakeBatchClient:
+    """Stands in for the Azure OpenAI client's files and batches APIs"""
+
+    def __init__(self, batch, files):
+        self.batches = SimpleNamespace(retrieve=lambda batch_id: batch)
+        self.files = SimpleNamespace(content=lambda file_id: SimpleNamespace(text=files[file_id]))
+
+
+def test_wait_for_batch_reports_failed_requests_from_the_error_file():
+    failed = {
+        "custom_id": "question-0",
+        "response": {"status_code": 429, "body": {"error": {"message": "Rate limit"}}},
+    }
+    batch = SimpleNamespace(status="completed", output_file_id=None, error_file_id="errors")
+    client = FakeBatchClient(batch, {"errors": json.dumps(failed) + "\n"})
+    chain = make_chain([CYPHER])
+
+    cypher_by_index, errors_by_index = chain.wait_for_batch("batch-1", client=client)
+
+    assert cypher_by_index == {}
+    assert errors_by_index == {0: "Rate limit (status 429)"}
+
+
+class FakeSession:
+    """Neo4j session stand-in that fails its first `failures` runs with a TransientError"""
+
+    def __init__(self, failures=0):
+        self.closed = False
+        self.failures = failures
+        self.queries = []
+
+    def run(self, query, params):
+        self.queries.append(query)
+        if self.failures:
+            self.failures -= 1
+            raise TransientError("Database unavailable")
+        return [SimpleNamespace(data=lambda: {"condition": "Asthma", "treatments": ["Inhaler"]})]
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeDriver:
+    """Hands out FakeSessions and remembers them"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sessions = []
+
+    def session(self, database=None):
+        self.sessions.append(FakeSession(self.failures))
+        return self.sessions[-1]
+
+
+def test_query_helper_refuses_to_open_a_second_session():
+    driver = FakeDriver()
+    helper = MedicalQueryHelper(SimpleNamespace(_driver=driver, _database="neo4j"))
+
+    with helper:
+        with pytest.raises(RuntimeError):
+            helper.__enter__()
+
+    assert len(driver.sessions) == 1
+    assert driver.sessions[0].closed
+
+
+def test_symptoms_for_conditions_matches_resolved_names_exactly():
+    graph = FakeGraph(records=[{"name": "anemia", "condition": "Anemia", "symptoms": ["Fatigue"]}])
+    helper = MedicalQueryHelper(graph, disease_index=DiseaseIndex(["Anemia", "Sickle Cell Anemia"]))
+
+    result = helper.get_symptoms_for_conditions(["anemia", "flu"])
+
+    assert graph.params == [{"exact": [{"name": "anemia", "condition": "Anemia"}], "names": ["flu"]}]
+    assert result == {"anemia": [{"condition": "Anemia", "symptoms": ["Fatigue"]}], "flu": []}
+
+
+def test_query_helper_runs_several_lookups_on_one_session_with_retries(monkeypatch):
+    monkeypatch.setattr(MedicalQueryHelper._session_query.retry, "sleep", lambda seconds: None)
+    driver = FakeDriver(failures=1)
+    helper = MedicalQueryHelper(SimpleNamespace(_driver=driver, _database="neo4j"))
+
+    with helper:
+        first = helper.get_treatments_for_condition("asthma")
+        second = helper.get_treatments_for_condition("copd")
+
+    session, = driver.sessions
+    # The transient failure was retried on the same session
+    assert len(session.queries) == 3
+    assert first == second == [{"condition": "Asthma", "treatments": ["Inhaler"]}]
+    assert session.closed
+
+
+def test_ask_many_sends_hints_and_a_single_closing_instruction():
+    graph = FakeGraph()
+    graph._driver, graph._database = FakeDriver(), "neo4j"
+    chain = make_chain([f"{CYPHER}\n---\n{CYPHER}"], graph, disease_index=DiseaseIndex(["Asthma"]))
+
+    results = chain.ask_many(["What treats asthma?", "What is a cold?"])
+
+    prompt, = chain.llm.prompts
+    assert '1) What treats asthma?\n(Exact condition name in the database: "Asthma")\n2) What is a cold?' in prompt
+    assert "Generate ONLY the Cypher query" not in prompt
+    assert prompt.endswith("separated by a line containing only ---")
+    assert [result["query"] for result in results] == [CYPHER, CYPHER]
+
+
+def test_async_symptoms_lookup_runs_through_the_pool():
+    import asyncio
+
+    graph = FakeGraph(records=[{"name": "flu", "condition": "Influenza", "symptoms": ["Fever"]}])
+    helper = MedicalQueryHelper(graph)
+
+    result = asyncio.run(helper.aget_symptoms_for_conditions(["flu", "flu"]))
+
+    assert result == {"flu": [{"condition": "Influenza", "symptoms": ["Fever"]}]}
+    assert graph.params == [{"exact": [], "names": ["flu"]}]
+
+
+def test_streamed_answer_is_not_followed_by_chain_output(capsys):
+    chain = make_chain([CYPHER, "Diabetes causes thirst."], streaming=True)
+
+    chain.ask_medical_question_clean("What are symptoms of diabetes?", show_cypher=True, stream=True)
+
+    out = capsys.readouterr().out
+    assert "Generated Cypher:" in out
+    assert out.endswith("💡 Answer: Diabetes causes thirst.\n")